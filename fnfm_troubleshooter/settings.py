@@ -83,6 +83,25 @@ DATABASES = {
 }
 
 
+# Caches shared by all workers
+CACHES = {
+    # Precomputed graph layouts and finished analyses
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+    # Prefetched check results (about 40 entries per selected job), kept apart
+    # so their volume never culls the entries of the default cache
+    'check_results': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'check_results'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -120,9 +139,27 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'), # Where your static files are located
+    ('lib', os.path.join(BASE_DIR, 'lib')), # vis-network / tom-select bundles used by the graph pages
 ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic writes content-hashed names plus .br/.gz variants, served with
+# immutable cache headers by troubleshooter_app.assets.serve_static.
+# With DEBUG = False, run `python manage.py collectstatic` before starting the
+# server: templates need the manifest (graph pages fall back to unhashed URLs).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'troubleshooter_app.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+# Images resized (max width in px) and optimised at collectstatic
+STATIC_IMAGE_WIDTHS = {
+    'FNFM_UH_view_Tool_string.jpeg': 600, # Displayed at max 300px, 2x for high-DPI screens
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -131,3 +168,9 @@ TERADATA_USER = os.getenv("TERADATA_USER")
 TERADATA_PASS = os.getenv("TERADATA_PASS")
 TERADATA_HOST = os.getenv("TERADATA_HOST")
 TERADATA_PORT = os.getenv("TERADATA_PORT")
+
+# On-demand profiling: staff users add ?profile=1 to the troubleshooter URL,
+# or a fraction of all requests is sampled. Profiles are listed in the admin.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_INTERVAL = 0.005 # Seconds between stack samples
+PROFILE_STORE_MAX_BYTES = 50 * 1024 * 1024 # Oldest profiles are evicted above this size
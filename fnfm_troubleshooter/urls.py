@@ -1,17 +1,16 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-import os 
+from troubleshooter_app.assets import serve_static
+import re
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('troubleshooter_app.urls')), # Include your app's URLs
 ]
 
-# Serve static files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    # This is crucial for pyvis graph HTML files to be accessible
-    #urlpatterns += static('/static/graphs/', document_root=os.path.join(settings.BASE_DIR, 'static', 'graphs'))
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
\ No newline at end of file
+# Serve static files (collected assets and the pyvis graph HTML files) from the app itself,
+# with precompressed variants and immutable caching for hashed names
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
+]
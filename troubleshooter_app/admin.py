@@ -1,3 +1,40 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
 
 # Register your models here.
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created', 'name', 'failures', 'partition_id', 'duration_ms', 'span_ms', 'samples', 'size_bytes', 'flame_graph')
+    list_filter = ('name',)
+    search_fields = ('failures', 'partition_id', 'path')
+    readonly_fields = [field.name for field in RequestProfile._meta.fields] + ['flame_graph']
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/folded/', self.admin_site.admin_view(self.folded_view), name='troubleshooter_app_requestprofile_folded'),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(description='Flame graph')
+    def flame_graph(self, obj):
+        url = reverse('admin:troubleshooter_app_requestprofile_folded', args=[obj.pk])
+        return format_html('<a href="{}">folded stacks</a>', url)
+
+    def folded_view(self, request, pk):
+        """
+        Download the folded stacks (input for flamegraph.pl, speedscope, ...).
+        """
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(profile.folded_stacks, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profile_{profile.pk}.folded"'
+        return response
@@ -0,0 +1,227 @@
+import functools
+import gzip
+import io
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.templatetags.static import PrefixNode, static
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are always produced
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, images are then served as they are
+    Image = None
+
+# --- Static asset pipeline ---
+# collectstatic writes content-hashed copies of every asset (Django's manifest
+# storage), plus .br/.gz variants of the text assets and resized copies of the
+# images listed in settings.STATIC_IMAGE_WIDTHS. serve_static then serves the
+# smallest variant the browser accepts, with immutable caching for hashed names.
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.html', '.svg', '.json', '.txt', '.map', '.xml', '.ttf')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def resized_name(name, width):
+    """
+    Return the static name of the copy of image name resized to width pixels.
+    """
+    root, ext = os.path.splitext(name)
+    return f"{root}.{width}w{ext}"
+
+
+def write_precompressed(path):
+    """
+    Write .gz (and .br if brotli is installed) variants next to the file at path.
+    Variants that would not be smaller than the original are removed instead.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage which also produces resized images and precompressed variants.
+    """
+
+    # The vendored bundles in lib/ reference source maps that are not shipped:
+    # leave sourceMappingURL comments as they are instead of failing on them
+    patterns = tuple(
+        (extension, tuple(
+            rule for rule in rules
+            if 'sourceMappingURL' not in (rule[0] if isinstance(rule, (tuple, list)) else rule)
+        ))
+        for extension, rules in ManifestStaticFilesStorage.patterns
+    )
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for name, width in getattr(settings, 'STATIC_IMAGE_WIDTHS', {}).items():
+            variant = self._resize_image(name, width)
+            if variant is not None:
+                yield name, variant, True
+        self.save_manifest()
+
+        for root, _, files in os.walk(self.location):
+            for filename in files:
+                if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    for compressed in write_precompressed(path):
+                        yield os.path.relpath(path, self.location), os.path.relpath(compressed, self.location), True
+
+    def _resize_image(self, name, width):
+        """
+        Save a resized, optimised copy of image name (plain and hashed) and register it in the manifest.
+        """
+        if Image is None or not self.exists(name):
+            return None
+        with self.open(name) as f:
+            image = Image.open(f)
+            image.load()
+        if image.width > width:
+            image.thumbnail((width, image.height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if image.format == 'PNG' or name.lower().endswith('.png'):
+            image.save(buffer, format='PNG', optimize=True)
+        else:
+            image.convert('RGB').save(buffer, format='JPEG', quality=82, optimize=True, progressive=True)
+
+        variant = resized_name(name, width)
+        content = ContentFile(buffer.getvalue())
+        hashed = self.hashed_name(variant, content)
+        for target in (variant, hashed):
+            if self.exists(target):
+                self.delete(target)
+            self._save(target, content)
+        self.hashed_files[self.hash_key(self.clean_name(variant))] = hashed
+        return hashed
+
+
+# --- Graph HTML assets ---
+# pyvis links vis-network (and tom-select when menus are enabled) from CDNs, and
+# lib/bindings/utils.js relative to the page. The same files are shipped in lib/
+# and collected under static/lib/, so graph pages use those hashed copies instead.
+
+GRAPH_LIB_ASSETS = {
+    'utils.js': 'lib/bindings/utils.js',
+    'vis-network.min.js': 'lib/vis-9.1.2/vis-network.min.js',
+    'vis-network.min.css': 'lib/vis-9.1.2/vis-network.css',
+    'vis-network.css': 'lib/vis-9.1.2/vis-network.css',
+    'tom-select.complete.js': 'lib/tom-select/tom-select.complete.min.js',
+    'tom-select.complete.min.js': 'lib/tom-select/tom-select.complete.min.js',
+    'tom-select.css': 'lib/tom-select/tom-select.css',
+}
+
+_GRAPH_ASSET_TAG = re.compile(
+    r'<(script|link)\b[^>]*?(?:src|href)="(?:[^"]*/)?(' + '|'.join(re.escape(name) for name in GRAPH_LIB_ASSETS) + r')"[^>]*>'
+)
+
+
+def localise_graph_assets(html):
+    """
+    Point the vis-network/tom-select/bindings tags of a pyvis page at the local static copies.
+    """
+    def _replace(match):
+        path = GRAPH_LIB_ASSETS[match.group(2)]
+        try:
+            url = static(path)
+        except ValueError:
+            # No manifest entry (collectstatic not run yet): the unhashed file is still served
+            url = PrefixNode.handle_simple('STATIC_URL') + path
+        if match.group(1) == 'script':
+            return f'<script src="{url}">'
+        return f'<link rel="stylesheet" href="{url}" />'
+
+    return _GRAPH_ASSET_TAG.sub(_replace, html)
+
+
+# --- Static file serving ---
+
+@functools.lru_cache(maxsize=1)
+def _hashed_names():
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def _find_static_file(path, hashed):
+    # Hashed names only exist in STATIC_ROOT. Other files (e.g. generated graphs, or
+    # lib/ before collectstatic) are resolved by the staticfiles finders first, which
+    # handle prefixed STATICFILES_DIRS entries, so stale collected copies never win.
+    if not hashed:
+        try:
+            found = finders.find(path)
+        except SuspiciousFileOperation:
+            found = None
+        if found and os.path.isfile(found):
+            return found
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(f"'{path}' could not be found")
+    if os.path.isfile(full_path):
+        return full_path
+    raise Http404(f"'{path}' could not be found")
+
+
+def serve_static(request, path):
+    """
+    Serve a static file, preferring its precompressed variant, with long-lived caching for hashed names.
+    """
+    hashed = path in _hashed_names()
+    full_path = _find_static_file(path, hashed)
+
+    accepted = request.headers.get('Accept-Encoding', '')
+    served_path, encoding = full_path, None
+    for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+        if name in accepted and os.path.isfile(full_path + suffix):
+            served_path, encoding = full_path + suffix, name
+            break
+
+    stat = os.stat(served_path)
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}-{encoding or "identity"}"'
+    headers = {
+        'ETag': etag,
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL,
+    }
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(full_path)
+        response = FileResponse(
+            open(served_path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+            filename=os.path.basename(full_path),
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
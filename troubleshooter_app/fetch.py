@@ -0,0 +1,149 @@
+import datetime
+import decimal
+
+import pyarrow as pa
+
+from .profiling import span
+
+# --- Arrow fetch layer for Teradata result sets ---
+# Result sets are pulled from the DBAPI cursor in batches and turned straight
+# into Arrow record batches, so neither duckdb nor pandas has to go through
+# row-by-row object-dtype DataFrames built by pd.read_sql.
+
+FETCH_BATCH_ROWS = 50_000
+# Results up to this many rows are fetched eagerly and the cursor is released;
+# anything bigger is streamed batch by batch while the consumer reads it.
+STREAM_THRESHOLD_ROWS = 200_000
+
+_ARROW_TYPES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    bytes: pa.binary(),
+    datetime.datetime: pa.timestamp('us'),
+    datetime.date: pa.date32(),
+    datetime.time: pa.time64('us'),
+}
+
+
+def _arrow_field(column):
+    """
+    Map a DBAPI cursor.description entry to an Arrow field (None if unknown).
+    """
+    name, type_code, _, _, precision, scale = column[:6]
+    if type_code is decimal.Decimal and precision:
+        return pa.field(name, pa.decimal128(int(precision), int(scale or 0)))
+    arrow_type = _ARROW_TYPES.get(type_code)
+    return pa.field(name, arrow_type) if arrow_type is not None else None
+
+
+def _to_record_batch(rows, fields, names):
+    """
+    Transpose a list of row tuples into an Arrow record batch.
+    """
+    columns = list(zip(*rows)) if rows else [[] for _ in names]
+    arrays = []
+    for i, values in enumerate(columns):
+        field = fields[i]
+        arrays.append(pa.array(values, type=field.type if field is not None else None))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def iter_record_batches(sql, conn, params=None, batch_size=FETCH_BATCH_ROWS):
+    """
+    Execute sql on a SQLAlchemy connection and yield Arrow record batches.
+    Columns the driver did not describe get the type inferred from each batch.
+    """
+    cursor = conn.connection.cursor()
+    try:
+        with span('teradata'):
+            if params is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        fields = [_arrow_field(column) for column in cursor.description]
+        first = True
+        while True:
+            with span('teradata'):
+                rows = cursor.fetchmany(batch_size)
+            if not rows and not first:
+                break
+            first = False
+            yield _to_record_batch(rows, fields, names)
+            if len(rows) < batch_size:
+                break
+    finally:
+        cursor.close()
+
+
+def _settle_schema(batches):
+    """
+    Return one schema for batches whose undescribed columns were inferred separately.
+    A column that is NULL in some batches takes the type of the others; one that
+    is NULL in all of them becomes a string column.
+    """
+    schema = pa.unify_schemas([batch.schema for batch in batches], promote_options='permissive')
+    return pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                      for field in schema])
+
+
+def _conform(batch, schema):
+    if batch.schema.equals(schema):
+        return batch
+    return pa.RecordBatch.from_arrays(
+        [column.cast(field.type) for column, field in zip(batch.columns, schema)], schema=schema)
+
+
+def fetch_arrow(sql, conn, params=None, batch_size=FETCH_BATCH_ROWS, stream_threshold=STREAM_THRESHOLD_ROWS):
+    """
+    Return the result of sql as a pyarrow.RecordBatchReader.
+
+    Results up to stream_threshold rows are read completely before returning;
+    larger results are read lazily, so the caller (duckdb, pandas) pulls the
+    remaining batches from the driver as it consumes them. The schema is settled
+    on the batches read before returning; later batches are cast to it.
+    """
+    batches = iter_record_batches(sql, conn, params, batch_size)
+    buffered = []
+    rows = 0
+    for batch in batches:
+        buffered.append(batch)
+        rows += batch.num_rows
+        if rows > stream_threshold:
+            schema = _settle_schema(buffered)
+
+            def _stream():
+                # Hand the buffered batches over one by one so they can be freed once consumed
+                while buffered:
+                    yield _conform(buffered.pop(0), schema)
+                for batch in batches:
+                    yield _conform(batch, schema)
+            return pa.RecordBatchReader.from_batches(schema, _stream())
+    schema = _settle_schema(buffered)
+    return pa.RecordBatchReader.from_batches(schema, [_conform(batch, schema) for batch in buffered])
+
+
+def fetch_table(sql, conn, params=None):
+    """
+    Return the result of sql as a pyarrow.Table.
+    """
+    return fetch_arrow(sql, conn, params).read_all()
+
+
+def fetch_scalar(sql, conn, params=None):
+    """
+    Return the first column of the first row of sql as a Python value (None if no rows).
+    """
+    table = fetch_table(sql, conn, params)
+    if table.num_rows == 0 or table.num_columns == 0:
+        return None
+    return table.column(0)[0].as_py()
+
+
+def fetch_exists(sql, conn, params=None):
+    """
+    Return True if sql yields at least one row.
+    """
+    return fetch_table(sql, conn, params).num_rows > 0
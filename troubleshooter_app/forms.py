@@ -19,4 +19,9 @@ class TroubleshooterForm(forms.Form):
         required=False,
         label="Choose a start job",
         widget=forms.Select(attrs={'class': 'form-select'})
-    )
\ No newline at end of file
+    )
+    cluster_quiet = forms.BooleanField(
+        required=False,
+        label="Cluster subtrees without alerts (large graphs)",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
@@ -0,0 +1,68 @@
+import hashlib
+import logging
+import math
+import os
+
+import networkx as nx
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# --- Server-side graph layout ---
+# Node positions only depend on the structure of the displayed subgraph, which
+# only changes with the KG file. They are computed once per (KG version,
+# subgraph) and cached, so the browser renders the graph with physics off.
+
+LAYOUT_CACHE_PREFIX = 'graph_layout'
+LAYOUT_ITERATIONS = 200
+# Spacing of the precomputed layout, in vis-network canvas pixels per node
+LAYOUT_NODE_SPACING = 140
+
+_kg_versions = {}
+
+
+def kg_version(path):
+    """
+    Return a content hash of the KG file, recomputed only when its mtime or size changes.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _kg_versions:
+        with open(path, 'rb') as f:
+            _kg_versions[key] = hashlib.sha1(f.read()).hexdigest()
+    return _kg_versions[key]
+
+
+def compute_layout(edges):
+    """
+    Return {node: (x, y)} for a directed graph given as (source, target) pairs.
+    """
+    graph = nx.DiGraph()
+    graph.add_edges_from(edges)
+    if graph.number_of_nodes() == 0:
+        return {}
+    scale = LAYOUT_NODE_SPACING * math.sqrt(graph.number_of_nodes())
+    positions = nx.spring_layout(graph, k=2 / math.sqrt(graph.number_of_nodes()),
+                                 iterations=LAYOUT_ITERATIONS, seed=0, scale=scale)
+    return {node: (round(float(x), 1), round(float(y), 1)) for node, (x, y) in positions.items()}
+
+
+def cached_layout(version, edges):
+    """
+    Return the layout of edges, computing it at most once per KG version
+    (the kg_version() of the graph the caller actually loaded).
+    Returns None if it cannot be computed here; the browser then lays the graph out.
+    """
+    edges = sorted(set(edges))
+    digest = hashlib.sha1(repr(edges).encode('utf-8')).hexdigest()
+    cache_key = f"{LAYOUT_CACHE_PREFIX}:{version}:{digest}"
+    positions = cache.get(cache_key)
+    if positions is None:
+        try:
+            positions = compute_layout(edges)
+        except ImportError:
+            # spring_layout needs scipy above 500 nodes
+            logger.exception("Error computing the layout of %d edges", len(edges))
+            return None
+        cache.set(cache_key, positions, timeout=None)
+    return positions
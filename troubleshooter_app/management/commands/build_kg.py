@@ -0,0 +1,37 @@
+import os
+import runpy
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from troubleshooter_app.profiling import SamplingProfiler, save_profile
+
+
+class Command(BaseCommand):
+    help = "Run data/ontology_to_kg.py to rebuild output_ORA_FNFM_KG.ttl, optionally profiled."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help="Profile the run and store it with the request profiles (admin > Request profiles).",
+        )
+
+    def handle(self, *args, **options):
+        data_dir = os.path.join(settings.BASE_DIR, 'data')
+        script_path = os.path.join(data_dir, 'ontology_to_kg.py')
+        # The script uses paths relative to the data directory
+        cwd = os.getcwd()
+        os.chdir(data_dir)
+        try:
+            if options['profile']:
+                profiler = SamplingProfiler()
+                with profiler:
+                    runpy.run_path(script_path, run_name='__main__')
+                profile = save_profile(profiler, name='ontology_to_kg.py', path=script_path)
+                self.stdout.write(f"Stored profile {profile.pk} ({profile.duration_ms:.0f} ms, {profile.samples} samples)")
+            else:
+                runpy.run_path(script_path, run_name='__main__')
+        finally:
+            os.chdir(cwd)
+        self.stdout.write(self.style.SUCCESS("Knowledge graph rebuilt."))
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('name', models.CharField(max_length=200)),
+                ('path', models.CharField(blank=True, max_length=500)),
+                ('failures', models.TextField(blank=True)),
+                ('partition_id', models.CharField(blank=True, max_length=64)),
+                ('parameters', models.JSONField(blank=True, default=dict)),
+                ('duration_ms', models.FloatField()),
+                ('samples', models.IntegerField()),
+                ('span_ms', models.JSONField(blank=True, default=dict)),
+                ('folded_stacks', models.TextField()),
+                ('size_bytes', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -1,3 +1,40 @@
 from django.db import models
 
 # Create your models here.
+
+
+class RequestProfile(models.Model):
+    """
+    A stored profile of one analysis request or KG build (see profiling.py).
+    """
+    created = models.DateTimeField(auto_now_add=True)
+    name = models.CharField(max_length=200)
+    path = models.CharField(max_length=500, blank=True)
+    failures = models.TextField(blank=True)
+    partition_id = models.CharField(max_length=64, blank=True)
+    parameters = models.JSONField(default=dict, blank=True)
+    duration_ms = models.FloatField()
+    samples = models.IntegerField()
+    span_ms = models.JSONField(default=dict, blank=True) # Exact time in rdflib / teradata / duckdb
+    folded_stacks = models.TextField() # Flame-graph-ready folded stacks
+    size_bytes = models.IntegerField()
+
+    class Meta:
+        ordering = ['-created']
+
+    def __str__(self):
+        return f"{self.name} {self.created:%Y-%m-%d %H:%M:%S} ({self.duration_ms:.0f} ms)"
+
+    @classmethod
+    def evict(cls, max_bytes):
+        """
+        Delete the oldest profiles until the stored folded stacks fit in max_bytes.
+        """
+        total = 0
+        evicted = []
+        for pk, size in cls.objects.order_by('-created', '-pk').values_list('pk', 'size_bytes'):
+            total += size
+            if total > max_bytes:
+                evicted.append(pk)
+        if evicted:
+            cls.objects.filter(pk__in=evicted).delete()
@@ -0,0 +1,116 @@
+import concurrent.futures
+import hashlib
+import logging
+import threading
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# --- Speculative prefetch of check results ---
+# As soon as serial number, job number and job start resolve to a partition_id
+# (before the user has chosen the failures), every (check, data channel) pair
+# mapped in the KG is evaluated in the background. Results go to a short-lived
+# cache which the Analyze step reads before querying Teradata itself.
+# Within a process each pair is evaluated at most once at a time: Analyze joins
+# a prefetch of the pair already running instead of querying it again, and
+# prefetches run on a bounded pool so they never hold more than
+# PREFETCH_WORKERS warehouse connections.
+
+PREFETCH_TTL = 600 # Seconds a prefetched check result stays usable
+PREFETCH_WORKERS = 4
+CHECK_RESULTS_CACHE = 'check_results'
+
+MISSING = object()
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+_pending = {} # Check cache key -> Future of the evaluation running (or queued) in this process
+_pending_lock = threading.Lock()
+
+
+def _check_cache_key(partition_id, check, datachannel):
+    digest = hashlib.sha1(repr((str(partition_id), check.__name__, datachannel)).encode('utf-8')).hexdigest()
+    return f"check_result:{digest}"
+
+
+def get_check_result(partition_id, check, datachannel):
+    """
+    Return the cached result of check for a data channel of partition_id, or MISSING.
+    """
+    return caches[CHECK_RESULTS_CACHE].get(_check_cache_key(partition_id, check, datachannel), MISSING)
+
+
+def store_check_result(partition_id, check, datachannel, result):
+    caches[CHECK_RESULTS_CACHE].set(_check_cache_key(partition_id, check, datachannel), result, PREFETCH_TTL)
+
+
+def evaluate_check(conn, partition_id, check, datachannel):
+    """
+    Return check(conn, partition_id, datachannel), reusing a cached result or
+    joining an evaluation of the same pair running in this process.
+    A prefetch of the pair still queued is taken over and run on conn right away.
+    """
+    result = get_check_result(partition_id, check, datachannel)
+    if result is not MISSING:
+        return result
+    key = _check_cache_key(partition_id, check, datachannel)
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None and future.cancel():
+            future = None
+        leader = future is None
+        if leader:
+            future = _pending[key] = concurrent.futures.Future()
+            future.set_running_or_notify_cancel() # Running, so it cannot be cancelled in turn
+    if not leader:
+        return future.result()
+
+    try:
+        result = check(conn, partition_id, datachannel)
+        store_check_result(partition_id, check, datachannel, result)
+    except Exception as e:
+        _finish(key, future, error=e)
+        raise
+    _finish(key, future, result=result)
+    return result
+
+
+def _finish(key, future, result=None, error=None):
+    with _pending_lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def start_prefetch(engine, partition_id, pairs):
+    """
+    Queue every (check, data channel) pair of partition_id on the prefetch pool.
+    Does nothing if the partition was prefetched recently. That marker is best
+    effort (cache.add is not atomic across processes on the file-based cache), so
+    two workers may occasionally prefetch the same partition.
+    """
+    if not caches[CHECK_RESULTS_CACHE].add(f"prefetch:{partition_id}", True, PREFETCH_TTL):
+        return
+    with _pending_lock:
+        for check, datachannel in pairs:
+            key = _check_cache_key(partition_id, check, datachannel)
+            if key not in _pending:
+                _pending[key] = _executor.submit(_prefetch_pair, engine, partition_id, check, datachannel, key)
+
+
+def _prefetch_pair(engine, partition_id, check, datachannel, key):
+    try:
+        result = get_check_result(partition_id, check, datachannel)
+        if result is MISSING:
+            with engine.connect() as conn:
+                result = check(conn, partition_id, datachannel)
+            store_check_result(partition_id, check, datachannel, result)
+        return result
+    except Exception:
+        logger.exception("Error prefetching %s for %s of partition %s", check.__name__, datachannel, partition_id)
+        raise
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
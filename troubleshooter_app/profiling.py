@@ -0,0 +1,169 @@
+import collections
+import contextlib
+import functools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# --- On-demand profiling ---
+# A sampling profiler reads the stack of the profiled thread every few
+# milliseconds from a background thread, so the profiled code runs unmodified.
+# Samples are kept as folded stacks ("frame;frame;frame count"), which
+# flamegraph.pl, speedscope and similar tools read directly. Time spent in
+# rdflib, Teradata fetches and duckdb is also measured exactly with spans,
+# because duckdb and the driver run in C where sampling cannot see them.
+
+PROFILE_SAMPLE_INTERVAL = getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005)
+
+_active = threading.local()
+
+
+class SamplingProfiler:
+    """
+    Sample the stack of the thread that starts the profiler until it is stopped.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.span_seconds = collections.defaultdict(float)
+        self.parameters = {}
+        self.duration = 0.0
+        self._thread_id = None
+        self._sampler = None
+        self._stopped = threading.Event()
+        self._started_at = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._started_at = time.perf_counter()
+        _active.profiler = self
+        self._sampler = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._started_at
+        _active.profiler = None
+
+    def _run(self):
+        own_file = __file__
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != own_file:
+                    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                    stack.append(f"{module}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def folded(self):
+        """
+        Return the samples in folded-stack format, heaviest stacks first.
+        """
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def active_profiler():
+    return getattr(_active, 'profiler', None)
+
+
+@contextlib.contextmanager
+def span(category):
+    """
+    Add the time spent in the block to category of the active profiler (no-op when not profiling).
+    """
+    profiler = active_profiler()
+    if profiler is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.span_seconds[category] += time.perf_counter() - started_at
+
+
+def annotate(**parameters):
+    """
+    Record parameters (e.g. partition_id) on the active profile, if any.
+    """
+    profiler = active_profiler()
+    if profiler is not None:
+        profiler.parameters.update(parameters)
+
+
+def save_profile(profiler, name, path=''):
+    """
+    Store a finished profile, then evict the oldest ones above PROFILE_STORE_MAX_BYTES.
+    """
+    from .models import RequestProfile
+
+    parameters = {
+        key: value if isinstance(value, (str, int, float, bool, list)) else str(value)
+        for key, value in profiler.parameters.items() if value not in (None, '', [])
+    }
+    folded = profiler.folded()
+    profile = RequestProfile.objects.create(
+        name=name,
+        path=path[:500],
+        failures=', '.join(parameters.get('failures', [])),
+        partition_id=str(parameters.get('partition_id', '')),
+        parameters=parameters,
+        duration_ms=round(profiler.duration * 1000, 1),
+        samples=profiler.samples,
+        span_ms={category: round(seconds * 1000, 1) for category, seconds in profiler.span_seconds.items()},
+        folded_stacks=folded,
+        size_bytes=len(folded.encode('utf-8')),
+    )
+    RequestProfile.evict(getattr(settings, 'PROFILE_STORE_MAX_BYTES', 50 * 1024 * 1024))
+    return profile
+
+
+def _should_profile(request):
+    if request.GET.get('profile') == '1' and request.user.is_staff:
+        return True
+    return random.random() < getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+
+
+def profiled_view(view):
+    """
+    Profile the view when a staff user passes ?profile=1, or for a PROFILE_SAMPLE_RATE fraction of requests.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _should_profile(request):
+            return view(request, *args, **kwargs)
+        profiler = SamplingProfiler()
+        with profiler:
+            response = view(request, *args, **kwargs)
+        # Profiling is best effort: a failure to store it must not fail the request
+        try:
+            save_profile(profiler, name=view.__name__, path=request.get_full_path())
+        except Exception:
+            logger.exception("Error saving the profile of %s", request.get_full_path())
+        return response
+
+    return wrapper
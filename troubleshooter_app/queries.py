@@ -0,0 +1,211 @@
+import contextlib
+import threading
+
+from .fetch import fetch_exists, fetch_scalar
+
+# --- Parameterized Teradata statements ---
+# Every query is a constant SQL text with ? bind variables, so each check is
+# parsed and planned once by the warehouse (request cache) instead of once per
+# partition_id / data channel literal, and no value is ever spliced into SQL.
+
+_statement_cache = {}
+_stats = threading.local()
+
+
+class Statement:
+    """
+    A normalised SQL text with bind variables, shared by every execution.
+    """
+
+    def __init__(self, sql):
+        self.sql = ' '.join(sql.split())
+
+    def scalar(self, conn, params):
+        _record(self)
+        return fetch_scalar(self.sql, conn, params)
+
+    def exists(self, conn, params):
+        _record(self)
+        return fetch_exists(self.sql, conn, params)
+
+
+def statement(sql):
+    """
+    Return the cached Statement for sql.
+    """
+    key = ' '.join(sql.split())
+    if key not in _statement_cache:
+        _statement_cache[key] = Statement(sql)
+    return _statement_cache[key]
+
+
+def _record(stmt):
+    counters = getattr(_stats, 'counters', None)
+    if counters is not None:
+        counters['executions'] += 1
+        counters['statements'].add(stmt.sql)
+
+
+@contextlib.contextmanager
+def statement_stats():
+    """
+    Count executions and distinct statement texts (i.e. parse/plan requests) in the block.
+    """
+    counters = {'executions': 0, 'statements': set()}
+    previous = getattr(_stats, 'counters', None)
+    _stats.counters = counters
+    try:
+        yield counters
+    finally:
+        _stats.counters = previous
+
+
+# --- Checks ---
+# A check turns (conn, partition_id, data channel) into True (alert) / False.
+# Each one is built once from its statement, its bind values and the rule
+# applied to the result.
+
+
+def _sum_above(threshold):
+    return lambda value: value is not None and value > threshold
+
+
+def define_check(name, sql, binds, evaluate=None):
+    """
+    Build a check. binds(partition_id, datachannel) returns the bind values;
+    evaluate(first value) decides the alert, or if None the alert is "any row returned".
+    """
+    stmt = statement(sql)
+
+    def check(conn, partition_id, triple_subject):
+        params = binds(partition_id, triple_subject)
+        if evaluate is None:
+            return stmt.exists(conn, params)
+        return evaluate(stmt.scalar(conn, params))
+
+    check.__name__ = name
+    return check
+
+
+def _partition_id_only(partition_id, datachannel):
+    return (partition_id,)
+
+
+def _partition_id_text(partition_id, datachannel):
+    return (str(partition_id),)
+
+
+def _datachannel_and_partition_id(partition_id, datachannel):
+    return (datachannel, str(partition_id))
+
+
+threshold_sup_10450 = define_check(
+    'threshold_sup_10450',
+    """ sel sum(error_count) as count_of_error
+    from PRD_RP_PRODUCT_VIEW.FNFM_LIMIT_CHECK_PER_JOB
+    where xcol = 'MCDIGVLTFM' and (metric_name = 'above_sigma_one'
+    or metric_name = 'below_sigma_one') and partition_id = ? """,
+    _partition_id_only,
+    _sum_above(10450),
+)
+
+threshold_sup_12000 = define_check(
+    'threshold_sup_12000',
+    """ sel sum(error_count) as sum_error_count
+    from PRD_RP_PRODUCT_VIEW.FNFM_LIMIT_CHECK_PER_JOB
+    where xcol = 'MCREFVLTFM' and partition_id = ? """,
+    _partition_id_only,
+    _sum_above(12000),
+)
+
+threshold_sup_5000 = define_check(
+    'threshold_sup_5000',
+    """ sel sum(error_count) as sum_error_count
+    from PRD_RP_PRODUCT_VIEW.FNFM_LIMIT_CHECK_PER_JOB
+    where (metric_name = 'above_sigma_one' or metric_name = 'below_sigma_one') and xcol = 'MCINVLTFM' and partition_id = ? """,
+    _partition_id_only,
+    _sum_above(5000),
+)
+
+discrete_sup_10 = define_check(
+    'discrete_sup_10',
+    """ sel sum(count_error) as count_of_error
+    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
+    where xcol = ? and xcol_decoded = 'FNFM_TripPhaseAFM' and partition_id = ? """,
+    _datachannel_and_partition_id,
+    _sum_above(10),
+)
+
+discrete_sup_20 = define_check(
+    'discrete_sup_20',
+    """ sel sum(count_error) as count_of_error
+    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
+    where xcol = ? and xcol_decoded = 'FNFM_EIPUplinkMessageSend' and partition_id = ? """,
+    _datachannel_and_partition_id,
+    _sum_above(20),
+)
+
+mcrterrfm_check = define_check(
+    'mcrterrfm_check',
+    """ sel sum(count_error) as count_of_error
+    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
+    where xcol = 'MCRTERRFM' and xcol_decoded in ('FNFM_EIPUplinkMessageSend','FNFM_EIPITCMessageSend', 'FNFM_EIPLoopbackMessageSend', 'FNFM_EIPDownlinkMessageReceive') and partition_id = ? """,
+    _partition_id_text,
+    _sum_above(1),
+)
+
+limit_check = define_check(
+    'limit_check',
+    """ sel sum(error_count),min("min"),max("max")
+    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_generic_limit_checks_agg_mavg
+    where xcol = ? and partition_id = ? """,
+    _datachannel_and_partition_id,
+    _sum_above(0),
+)
+
+status_check = define_check(
+    'status_check',
+    """ sel partition_id
+    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_generic_status_checks
+    where event_name = ? and partition_id = ? """,
+    _datachannel_and_partition_id,
+)
+
+large_pump = define_check(
+    'large_pump',
+    """ sel partition_id
+    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_large_pump_cal_check
+    where health_indicator = 'Fail' and partition_id = ? """,
+    _partition_id_text,
+)
+
+small_pump = define_check(
+    'small_pump',
+    """ sel partition_id
+    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_small_pump_cal_check
+    where health_indicator = 'Fail' and partition_id = ? """,
+    _partition_id_text,
+)
+
+mterrstafm_check = define_check(
+    'mterrstafm_check',
+    """ sel sum(count_error) as count_of_error
+    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
+    where xcol = 'MTERRSTAFM' and xcol_decoded in ('FNFM_FaultIbusFM', 'FNFM_TripPhaseBFM', 'FNFM_TripPhaseCFM', 'FNFM_FaultIbFM', 'FNFM_FaultIaFM', 'FNFM_TripPhaseAFM') and partition_id = ? """,
+    _partition_id_text,
+    _sum_above(1),
+)
+
+
+# --- Partition lookup ---
+
+partition_id_statement = statement(""" sel partition_id
+    from PRD_RP_PRODUCT_VIEW.FNFM_FLEET_METADATA
+    where serial_number = ? and job_number = ? and CAST(job_start AS CHAR(26)) = ? """)
+
+
+def lookup_partition_id(conn, serial_number, job_number, job_start):
+    """
+    Return the partition_id of a serial number / job number / job start, or None.
+    """
+    return partition_id_statement.scalar(conn, (serial_number, job_number, job_start))
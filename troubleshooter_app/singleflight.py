@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+# --- Single-flight coalescing of identical work ---
+# Within a process, callers with the same key wait on the first caller's
+# computation. Across workers, the first caller holds a lock file in the local
+# store and publishes its result in the shared cache for the others to pick up.
+
+SINGLE_FLIGHT_LOCK_DIR = os.path.join(settings.BASE_DIR, 'cache', 'single_flight')
+# How long a finished result stays available to waiters from other workers
+SINGLE_FLIGHT_RESULT_TTL = 60
+# A lock not refreshed for this long is considered abandoned by a crashed worker
+SINGLE_FLIGHT_LOCK_TIMEOUT = 600
+SINGLE_FLIGHT_POLL_INTERVAL = 0.25
+
+_MISSING = object()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def single_flight(key, fn):
+    """
+    Return fn(), sharing one in-flight computation between all concurrent callers with the same key.
+    """
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _single_flight_across_workers(key, fn)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
+
+
+def _acquire_lock(lock_path):
+    """
+    Create lock_path atomically and return its token, or None if another worker holds it.
+    An abandoned lock is taken over and the creation retried once.
+    """
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _lock_is_stale(lock_path) and _break_stale_lock(lock_path):
+                continue
+            return None
+        token = f"{os.getpid()}-{uuid.uuid4().hex}"
+        with os.fdopen(fd, 'w') as f:
+            f.write(token)
+        return token
+    return None
+
+
+def _break_stale_lock(lock_path):
+    """
+    Move a stale lock out of the way; only one of several competing workers can succeed.
+    """
+    # rename is atomic: a worker that lost the race gets FileNotFoundError
+    moved_path = f"{lock_path}.{uuid.uuid4().hex}.stale"
+    try:
+        os.rename(lock_path, moved_path)
+    except FileNotFoundError:
+        return False
+    if not _lock_is_stale(moved_path):
+        # Another worker replaced the stale lock in between: put its fresh lock back
+        # (link never overwrites, so a newer lock in place is left alone)
+        try:
+            os.link(moved_path, lock_path)
+        except FileExistsError:
+            pass
+        os.remove(moved_path)
+        return False
+    os.remove(moved_path)
+    return True
+
+
+def _release_lock(lock_path, token):
+    """
+    Remove lock_path if it is still the lock identified by token.
+    """
+    try:
+        with open(lock_path) as f:
+            if f.read() != token:
+                return
+        os.remove(lock_path)
+    except FileNotFoundError:
+        pass
+
+
+def _lock_is_stale(lock_path):
+    try:
+        return time.time() - os.path.getmtime(lock_path) > SINGLE_FLIGHT_LOCK_TIMEOUT
+    except FileNotFoundError:
+        return False
+
+
+def _keep_lock_fresh(lock_path, stopped):
+    """
+    Touch the lock while its holder computes, so a long computation never looks abandoned.
+    """
+    while not stopped.wait(SINGLE_FLIGHT_LOCK_TIMEOUT / 3):
+        try:
+            os.utime(lock_path)
+        except FileNotFoundError:
+            return
+
+
+def _single_flight_across_workers(key, fn):
+    os.makedirs(SINGLE_FLIGHT_LOCK_DIR, exist_ok=True)
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    lock_path = os.path.join(SINGLE_FLIGHT_LOCK_DIR, f"{digest}.lock")
+    result_key = f"single_flight:{digest}"
+
+    while True:
+        token = _acquire_lock(lock_path)
+        if token is not None:
+            stopped = threading.Event()
+            heartbeat = threading.Thread(target=_keep_lock_fresh, args=(lock_path, stopped), daemon=True)
+            heartbeat.start()
+            try:
+                result = fn()
+                cache.set(result_key, result, SINGLE_FLIGHT_RESULT_TTL)
+                return result
+            finally:
+                stopped.set()
+                heartbeat.join()
+                _release_lock(lock_path, token)
+
+        # Another worker is computing it: wait until it releases the lock
+        while os.path.exists(lock_path) and not _lock_is_stale(lock_path):
+            time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        result = cache.get(result_key, _MISSING)
+        if result is not _MISSING:
+            return result
+        # The other worker failed (or died): compete for the lock again
@@ -0,0 +1,18 @@
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+
+from ..assets import resized_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def static_resized(path, width):
+    """
+    URL of the copy of image path resized to width at collectstatic, or of the original if there is none.
+    """
+    variant = resized_name(path, width)
+    if staticfiles_storage.exists(variant):
+        return static(variant)
+    return static(path)
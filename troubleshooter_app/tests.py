@@ -1,3 +1,452 @@
-from django.test import TestCase
+import concurrent.futures
+import contextlib
+import decimal
+import os
+import re
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from . import fetch, prefetch, profiling, queries, singleflight, views
+
+
+
+class FakeCursor:
+    """
+    A DBAPI cursor returning rows for columns described as (name, type_code[, precision, scale]).
+    """
+
+    def __init__(self, columns, rows):
+        self.description = [(c[0], c[1], None, None, *(c[2:] or (None, None)), True) for c in columns]
+        self.rows = list(rows)
+        self.executed = None
+        self.fetched = 0
+        self.closed = False
+
+    def execute(self, sql, params=None):
+        self.executed = (sql, params)
+
+    def fetchmany(self, size):
+        rows = self.rows[self.fetched:self.fetched + size]
+        self.fetched += len(rows)
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """
+    Stands in for a SQLAlchemy connection: conn.connection.cursor() is the DBAPI cursor.
+    """
+
+    def __init__(self, cursor):
+        self.connection = mock.Mock(cursor=mock.Mock(return_value=cursor))
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_dir = lock_dir.name
+        for name, value in (('SINGLE_FLIGHT_LOCK_DIR', self.lock_dir), ('SINGLE_FLIGHT_POLL_INTERVAL', 0.01)):
+            patcher = mock.patch.object(singleflight, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _lock_path(self, key):
+        digest = singleflight.hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.lock_dir, f"{digest}.lock"), f"single_flight:{digest}"
+
+    def _run_concurrently(self, key, fn, count=5):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(singleflight.single_flight(key, fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results, errors
+
+    def test_concurrent_callers_share_one_computation(self):
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {'value': 42}
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self._run_concurrently('same', compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_error_is_shared_with_waiters(self):
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            raise ValueError('warehouse unavailable')
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self._run_concurrently('failing', compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+
+    def test_different_keys_are_not_coalesced(self):
+        self.assertEqual(singleflight.single_flight('a', lambda: 'a'), 'a')
+        self.assertEqual(singleflight.single_flight('b', lambda: 'b'), 'b')
+
+    def test_waiter_picks_up_result_published_by_another_worker(self):
+        lock_path, result_key = self._lock_path('shared')
+        with open(lock_path, 'w') as f:
+            f.write('other-worker')
+        compute = mock.Mock(return_value='computed here')
+
+        def other_worker_finishes():
+            cache.set(result_key, 'computed elsewhere', 60)
+            os.remove(lock_path)
+
+        threading.Timer(0.1, other_worker_finishes).start()
+        self.assertEqual(singleflight.single_flight('shared', compute), 'computed elsewhere')
+        compute.assert_not_called()
+
+    def test_waiter_computes_when_other_worker_fails(self):
+        lock_path, _ = self._lock_path('abandoned')
+        with open(lock_path, 'w') as f:
+            f.write('other-worker')
+        threading.Timer(0.1, os.remove, args=[lock_path]).start()
+        self.assertEqual(singleflight.single_flight('abandoned', lambda: 'recomputed'), 'recomputed')
+        self.assertFalse(os.path.exists(lock_path))
+
+    def test_stale_lock_is_taken_over(self):
+        lock_path, _ = self._lock_path('stale')
+        with open(lock_path, 'w') as f:
+            f.write('crashed-worker')
+        old = time.time() - singleflight.SINGLE_FLIGHT_LOCK_TIMEOUT - 10
+        os.utime(lock_path, (old, old))
+        self.assertEqual(singleflight.single_flight('stale', lambda: 'fresh'), 'fresh')
+        self.assertEqual(os.listdir(self.lock_dir), [])
+
+    def test_fresh_lock_is_not_broken(self):
+        lock_path, _ = self._lock_path('fresh')
+        with open(lock_path, 'w') as f:
+            f.write('other-worker')
+        self.assertFalse(singleflight._break_stale_lock(lock_path))
+        with open(lock_path) as f:
+            self.assertEqual(f.read(), 'other-worker')
+
+    def test_lock_is_refreshed_while_computing(self):
+        lock_path, _ = self._lock_path('slow')
+        with mock.patch.object(singleflight, 'SINGLE_FLIGHT_LOCK_TIMEOUT', 0.3):
+            def compute():
+                old = time.time() - 10
+                os.utime(lock_path, (old, old))
+                time.sleep(0.4)
+                return singleflight._lock_is_stale(lock_path)
+
+            self.assertFalse(singleflight.single_flight('slow', compute))
+
+
+class ProfiledViewTests(SimpleTestCase):
+
+    def test_failed_profile_save_does_not_fail_the_request(self):
+        view = profiling.profiled_view(lambda request: HttpResponse('ok'))
+        request = RequestFactory().get('/?profile=1')
+        with mock.patch.object(profiling, '_should_profile', return_value=True), \
+                mock.patch.object(profiling, 'save_profile', side_effect=RuntimeError('database is locked')), \
+                self.assertLogs('troubleshooter_app.profiling', 'ERROR'):
+            response = view(request)
+        self.assertEqual(response.content, b'ok')
+
+
+class FetchTests(SimpleTestCase):
+
+    def test_empty_result(self):
+        cursor = FakeCursor([('partition_id', str)], [])
+        conn = FakeConnection(cursor)
+        table = fetch.fetch_table('sel partition_id from t where partition_id = ?', conn, ('42',))
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, ['partition_id'])
+        self.assertEqual(cursor.executed, ('sel partition_id from t where partition_id = ?', ('42',)))
+        self.assertTrue(cursor.closed)
+        self.assertIsNone(fetch.fetch_scalar('sel 1', FakeConnection(FakeCursor([('x', int)], []))))
+        self.assertFalse(fetch.fetch_exists('sel 1', FakeConnection(FakeCursor([('x', int)], []))))
+
+    def test_null_sum(self):
+        conn = FakeConnection(FakeCursor([('count_of_error', decimal.Decimal, 38, 0)], [(None,)]))
+        self.assertIsNone(fetch.fetch_scalar('sel sum(error_count) from t', conn))
+
+    def test_decimal_columns_keep_precision_and_scale(self):
+        rows = [(decimal.Decimal('1.50'), 'a'), (decimal.Decimal('12345.25'), 'b')]
+        conn = FakeConnection(FakeCursor([('value', decimal.Decimal, 18, 2), ('name', str)], rows))
+        table = fetch.fetch_table('sel value, name from t', conn)
+        self.assertEqual(table.schema.field('value').type, fetch.pa.decimal128(18, 2))
+        self.assertEqual(table.column('value').to_pylist(), [decimal.Decimal('1.50'), decimal.Decimal('12345.25')])
+
+    def test_undescribed_column_null_in_first_batch(self):
+        rows = [(None,)] * 3 + [(7,)] * 3
+        conn = FakeConnection(FakeCursor([('value', None)], rows))
+        table = fetch.fetch_arrow('sel value from t', conn, batch_size=3).read_all()
+        self.assertEqual(table.schema.field('value').type, fetch.pa.int64())
+        self.assertEqual(table.column('value').to_pylist(), [None] * 3 + [7] * 3)
+
+    def test_large_result_is_streamed(self):
+        rows = [(i, f"job {i}") for i in range(100)]
+        cursor = FakeCursor([('id', int), ('job', str)], rows)
+        reader = fetch.fetch_arrow('sel id, job from t', FakeConnection(cursor), batch_size=10, stream_threshold=25)
+        # Only the batches up to the threshold were read before returning
+        self.assertEqual(cursor.fetched, 30)
+        self.assertFalse(cursor.closed)
+        table = reader.read_all()
+        self.assertEqual(table.column('id').to_pylist(), list(range(100)))
+        self.assertTrue(cursor.closed)
+
+    def test_streamed_batches_follow_the_settled_schema(self):
+        rows = [(None,)] * 30 + [(7,)] * 10
+        cursor = FakeCursor([('value', None)], rows)
+        reader = fetch.fetch_arrow('sel value from t', FakeConnection(cursor), batch_size=10, stream_threshold=25)
+        table = reader.read_all()
+        self.assertEqual(table.schema.field('value').type, fetch.pa.string())
+        self.assertEqual(table.column('value').to_pylist()[-1], '7')
+
+
+class RootCauseTests(SimpleTestCase):
+
+    def test_names_with_quotes(self):
+        df_clean = views.pd.DataFrame([
+            ("can't set the packer", 'hasRootCause', "packer's valve", None),
+            ("packer's valve", 'isTriggeredBy', 'FNFM CAN device check', None),
+            ('FNFM CAN device check', 'consume', 'CAN_ERR', True),
+            ('FNFM CAN device check', 'consume', 'CAN_OK', False),
+        ], columns=['Subject', 'Predicate', 'Object', 'Status'])
+        messages = []
+        rows = views.root_cause_rows(df_clean, "can't set the packer", messages)
+        self.assertEqual(messages, [])
+        self.assertEqual(rows, [["can't set the packer", "packer's valve", 'FNFM CAN device check', 'CAN_ERR 🔴']])
+
+
+class CollectStaticTests(SimpleTestCase):
+
+    def test_collectstatic_builds_the_manifest_and_variants(self):
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.assertTrue(os.path.exists(os.path.join(static_root, 'staticfiles.json')))
+            with override_settings(DEBUG=False):
+                url = static('lib/vis-9.1.2/vis-network.min.js')
+            self.assertRegex(url, r'^/static/lib/vis-9\.1\.2/vis-network\.min\.[0-9a-f]{12}\.js$')
+            hashed = os.path.join(static_root, url[len('/static/'):])
+            self.assertTrue(os.path.exists(hashed + '.gz'))
+            # Source map references of the vendored bundles are left untouched
+            with open(hashed) as f:
+                self.assertIn('//# sourceMappingURL=vis-network.min.js.map', f.read())
+            with override_settings(DEBUG=False):
+                image = static('FNFM_UH_view_Tool_string.600w.jpeg')
+            self.assertTrue(os.path.exists(os.path.join(static_root, image[len('/static/'):])))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BuildGraphTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_empty_analysis_renders_an_empty_graph(self):
+        # Filtering an empty df_final leaves a frame without any column
+        net = views.build_graph(views.pd.DataFrame())
+        self.assertEqual(net.nodes, [])
+
+    def test_positions_are_precomputed(self):
+        df_clean = views.pd.DataFrame([
+            ('failure', 'hasRootCause', 'root cause', None),
+            ('root cause', 'isTriggeredBy', 'trigger', None),
+        ], columns=['Subject', 'Predicate', 'Object', 'Status'])
+        net = views.build_graph(df_clean)
+        self.assertFalse(net.options.physics.enabled)
+        self.assertTrue(all('x' in node and 'y' in node for node in net.nodes))
+
+    def test_browser_lays_out_the_graph_when_the_layout_fails(self):
+        df_clean = views.pd.DataFrame([('failure', 'hasRootCause', 'root cause', None)],
+                                      columns=['Subject', 'Predicate', 'Object', 'Status'])
+        with mock.patch('troubleshooter_app.layout.compute_layout', side_effect=ImportError('No module named scipy')), \
+                self.assertLogs('troubleshooter_app.layout', 'ERROR'):
+            net = views.build_graph(df_clean)
+        self.assertTrue(net.options.physics.enabled)
+        self.assertEqual(len(net.nodes), 2)
+
+
+class PruneGraphsTests(SimpleTestCase):
+
+    def test_old_graph_files_are_removed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            names = ['graph_12604_0123456789.html', 'graph_12604_0123456789.html.gz',
+                     'graph_12604_0123456789.html.br', 'graph_777_abcdef0123.html', 'graph_12604.html']
+            for name in names:
+                open(os.path.join(directory, name), 'w').close()
+            old = time.time() - views.GRAPH_MAX_AGE - 10
+            for name in names[:3] + names[4:]:
+                os.utime(os.path.join(directory, name), (old, old))
+            views.prune_graphs(directory)
+            # Recent graphs and files this code did not write are kept
+            self.assertEqual(sorted(os.listdir(directory)), ['graph_12604.html', 'graph_777_abcdef0123.html'])
+
+
+class QueriesTests(SimpleTestCase):
+    CHECKS = [
+        queries.threshold_sup_10450, queries.threshold_sup_12000, queries.threshold_sup_5000,
+        queries.discrete_sup_10, queries.discrete_sup_20, queries.mcrterrfm_check, queries.limit_check,
+        queries.status_check, queries.large_pump, queries.small_pump, queries.mterrstafm_check,
+    ]
+
+    def test_statements_only_use_bind_variables(self):
+        self.assertTrue(queries._statement_cache)
+        for sql in queries._statement_cache:
+            with self.subTest(sql=sql):
+                self.assertIn('?', sql)
+                # Per-request values are never spliced in as literals
+                self.assertNotRegex(sql, r"(?i)partition_id\s*=\s*['\d]")
+                self.assertNotIn('{', sql)
+
+    def test_binds_follow_the_placeholders(self):
+        partition_id, datachannel = 12604, "FNFM_Tool'Status"
+        expected = {'partition_id': str(partition_id), 'xcol': datachannel, 'event_name': datachannel}
+        for check in self.CHECKS:
+            with self.subTest(check=check.__name__):
+                cursor = FakeCursor([('value', int)], [])
+                check(FakeConnection(cursor), partition_id, datachannel)
+                sql, params = cursor.executed
+                columns = re.findall(r'(\w+)\s*=\s*\?', sql)
+                self.assertEqual(len(columns), sql.count('?'))
+                self.assertEqual([str(value) for value in params], [expected[column] for column in columns])
+
+    def test_partition_lookup_binds(self):
+        cursor = FakeCursor([('partition_id', str)], [('12604',)])
+        self.assertEqual(queries.lookup_partition_id(FakeConnection(cursor), 'SN1', 'J2', '2024-01-01 00:00:00'), '12604')
+        self.assertEqual(cursor.executed[1], ('SN1', 'J2', '2024-01-01 00:00:00'))
+
+
+class FakeEngine:
+    """
+    Stands in for a SQLAlchemy engine, counting the connections open at once.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.max_open = 0
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def connect(self):
+        with self.lock:
+            self.open += 1
+            self.max_open = max(self.max_open, self.open)
+        try:
+            yield 'prefetch connection'
+        finally:
+            with self.lock:
+                self.open -= 1
+
+
+@override_settings(CACHES={**LOCMEM_CACHE, 'check_results': LOCMEM_CACHE['default']})
+class PrefetchTests(SimpleTestCase):
+
+    def setUp(self):
+        prefetch.caches[prefetch.CHECK_RESULTS_CACHE].clear()
+
+    def test_analyze_joins_a_running_prefetch(self):
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def status_check(conn, partition_id, datachannel):
+            calls.append(conn)
+            started.set()
+            release.wait(5)
+            return True
+
+        prefetch.start_prefetch(FakeEngine(), 'p-join', [(status_check, 'CAN')])
+        self.assertTrue(started.wait(5))
+        threading.Timer(0.1, release.set).start()
+        self.assertTrue(prefetch.evaluate_check('analyze connection', 'p-join', status_check, 'CAN'))
+        self.assertEqual(calls, ['prefetch connection'])
+        self.assertTrue(prefetch.get_check_result('p-join', status_check, 'CAN'))
+
+    def test_analyze_takes_over_a_queued_prefetch(self):
+        queued = concurrent.futures.Future()
+        check = mock.Mock(__name__='limit_check', return_value=False)
+        with mock.patch.object(prefetch, '_executor', mock.Mock(submit=mock.Mock(return_value=queued))):
+            prefetch.start_prefetch(FakeEngine(), 'p-queued', [(check, 'MCINVLTFM')])
+        self.assertFalse(prefetch.evaluate_check('analyze connection', 'p-queued', check, 'MCINVLTFM'))
+        self.assertTrue(queued.cancelled())
+        check.assert_called_once_with('analyze connection', 'p-queued', 'MCINVLTFM')
+
+    def test_concurrent_analyses_share_a_pair(self):
+        release, calls = threading.Event(), []
+
+        def large_pump(conn, partition_id, datachannel):
+            calls.append(conn)
+            release.wait(5)
+            return False
+
+        threads = [threading.Thread(target=prefetch.evaluate_check, args=(i, 'p-shared', large_pump, 'PUMP'))
+                   for i in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+
+    def test_prefetch_concurrency_is_bounded(self):
+        engine = FakeEngine()
+        done = threading.Semaphore(0)
+
+        def small_pump(conn, partition_id, datachannel):
+            time.sleep(0.02)
+            done.release()
+            return False
+
+        prefetch.start_prefetch(engine, 'p-bounded', [(small_pump, f"channel {i}") for i in range(12)])
+        for _ in range(12):
+            self.assertTrue(done.acquire(timeout=5))
+        self.assertLessEqual(engine.max_open, prefetch.PREFETCH_WORKERS)
+        # A recently prefetched partition is not queued again
+        with mock.patch.object(prefetch, '_executor') as executor:
+            prefetch.start_prefetch(engine, 'p-bounded', [(small_pump, 'channel 0')])
+        executor.submit.assert_not_called()
+
+    def test_prefetch_errors_are_logged(self):
+        def status_check(conn, partition_id, datachannel):
+            raise RuntimeError('warehouse unavailable')
+
+        with self.assertLogs('troubleshooter_app.prefetch', 'ERROR'):
+            prefetch.start_prefetch(FakeEngine(), 'p-error', [(status_check, 'CAN')])
+            deadline = time.time() + 5
+            while prefetch._pending and time.time() < deadline:
+                time.sleep(0.01)
+        self.assertIs(prefetch.get_check_result('p-error', status_check, 'CAN'), prefetch.MISSING)
@@ -3,14 +3,28 @@ from rdflib import Graph, Literal, Namespace, RDF, RDFS, URIRef
 from rdflib.namespace import OWL, RDF, RDFS, FOAF, XSD, DC, SKOS
 from pyvis.network import Network
 import duckdb
+import pyarrow as pa
+import functools
+import hashlib
 import os
+import re
 import tempfile
+import time
 import shutil # For moving the graph file
 from sqlalchemy import create_engine, text
 from django.shortcuts import render
 from django.conf import settings
 from django.http import HttpResponse
 from .forms import TroubleshooterForm
+from .fetch import fetch_arrow
+from .queries import (
+    large_pump, limit_check, lookup_partition_id, mterrstafm_check, small_pump, statement_stats, status_check,
+)
+from .assets import localise_graph_assets, write_precompressed
+from .layout import cached_layout, kg_version
+from .singleflight import single_flight
+from .profiling import annotate, profiled_view, span
+from .prefetch import evaluate_check, start_prefetch
 import urllib.parse
 from dotenv import load_dotenv
 
@@ -18,7 +32,9 @@ from dotenv import load_dotenv
 # Ensure the path is correct relative to BASE_DIR
 file_path = os.path.join(settings.BASE_DIR, 'data', 'output_ORA_FNFM_KG.ttl')
 g = Graph()
+kg_loaded_version = None # Content hash of the KG actually loaded in g (keys the cached layouts)
 try:
+    kg_loaded_version = kg_version(file_path)
     g.parse(file_path, format='turtle')
     print("Ontology loaded successfully.")
 except Exception as e:
@@ -85,8 +101,9 @@ def execute_query_for_concept(concept):
         FILTER (?predicate != rdf:type)
     }}
     """
-    result = g.query(query)
-    labels_list = [(str(row[0]), str(row[1]), str(row[2])) for row in result]
+    with span('rdflib'):
+        result = g.query(query)
+        labels_list = [(str(row[0]), str(row[1]), str(row[2])) for row in result]
     return labels_list
 
 
@@ -122,96 +139,45 @@ def graph_search_tuple(concept, visited=None, result=None, max_depth=-1, depth=0
 
     return depth_results
 
+def graph_search_union(concepts, max_depth=-1):
+    """
+    Return the union of the depth dictionaries of several concepts.
+    The visited list is shared, so overlapping subgraphs are only traversed once.
+    """
+    visited = []
+    result = []
+    depth_results = {}
+    for concept in concepts:
+        graph_search_tuple(concept, visited, result, max_depth, 0, depth_results)
+    return depth_results
+
 # --- 3. Teradata Query Functions ---
-# These functions will now take a connection object (conn) as an argument
-
-def threshold_sup_10450(conn, partition_id, triple_subject):
-    sql = f""" sel sum(error_count) as count_of_error
-    from PRD_RP_PRODUCT_VIEW.FNFM_LIMIT_CHECK_PER_JOB
-    where xcol = 'MCDIGVLTFM' and (metric_name = 'above_sigma_one'
-    or metric_name = 'below_sigma_one') and partition_id = {partition_id}"""
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return result_value > 10450
-
-def threshold_sup_12000(conn, partition_id, triple_subject):
-    sql = f""" sel sum(error_count) as sum_error_count
-    from PRD_RP_PRODUCT_VIEW.FNFM_LIMIT_CHECK_PER_JOB
-    where xcol = 'MCREFVLTFM' and partition_id = {partition_id} """
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return result_value is not None and result_value > 12000
-
-def threshold_sup_5000(conn, partition_id, triple_subject):
-    sql = f""" sel sum(error_count) as sum_error_count
-    from PRD_RP_PRODUCT_VIEW.FNFM_LIMIT_CHECK_PER_JOB
-    where (metric_name = 'above_sigma_one' or metric_name = 'below_sigma_one') and xcol = 'MCINVLTFM' and partition_id = {partition_id} """
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return result_value > 5000
-
-def discrete_sup_10(conn, partition_id, triple_subject):
-    sql = f""" sel sum(count_error) as count_of_error
-    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
-    where xcol = '{triple_subject}' and xcol_decoded = 'FNFM_TripPhaseAFM' and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return int(result_value) > 10 if result_value is not None else False
-
-def discrete_sup_20(conn, partition_id, triple_subject):
-    sql = f""" sel sum(count_error) as count_of_error
-    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
-    where xcol = '{triple_subject}' and xcol_decoded = 'FNFM_EIPUplinkMessageSend' and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return int(result_value) > 20 if result_value is not None else False
-
-def mcrterrfm_check(conn, partition_id, triple_subject):
-    sql = f""" sel sum(count_error) as count_of_error
-    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
-    where xcol = 'MCRTERRFM' and xcol_decoded in ('FNFM_EIPUplinkMessageSend','FNFM_EIPITCMessageSend', 'FNFM_EIPLoopbackMessageSend', 'FNFM_EIPDownlinkMessageReceive') and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return int(result_value) > 1 if result_value is not None else False
-
-def limit_check(conn, partition_id, triple_subject):
-    sql = f""" sel sum(error_count),min("min"),max("max")
-    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_generic_limit_checks_agg_mavg
-    where xcol = '{triple_subject}' and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return int(result_value) > 0 if result_value is not None else False
-
-def status_check(conn, partition_id, triple_subject):
-    sql = f""" sel partition_id
-    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_generic_status_checks
-    where event_name = '{triple_subject}' and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    return not df.empty
-
-def large_pump(conn, partition_id, triple_subject):
-    sql = f""" sel partition_id
-    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_large_pump_cal_check
-    where health_indicator = 'Fail' and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    return not df.empty
-
-def small_pump(conn, partition_id, triple_subject):
-    sql = f""" sel partition_id
-    from PRD_GLBL_DATA_PRODUCTS.FNFM_fleet_timeseries_small_pump_cal_check
-    where health_indicator = 'Fail' and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    return not df.empty
-
-def mterrstafm_check(conn, partition_id, triple_subject):
-    sql = f""" sel sum(count_error) as count_of_error
-    from PRD_RP_PRODUCT_VIEW.FNFM_STATUS_WORDS_AGGREGATED_PER_JOB
-    where xcol = 'MTERRSTAFM' and xcol_decoded in ('FNFM_FaultIbusFM', 'FNFM_TripPhaseBFM', 'FNFM_TripPhaseCFM', 'FNFM_FaultIbFM', 'FNFM_FaultIaFM', 'FNFM_TripPhaseAFM') and partition_id= '{partition_id}' """
-    df = pd.read_sql(sql, conn)
-    result_value = df.iloc[0, 0]
-    return int(result_value) > 1 if result_value is not None else False
+# The checks are defined once as parameterized statements in queries.py:
+# threshold_sup_*, discrete_sup_*, mcrterrfm_check, limit_check, status_check,
+# large_pump, small_pump and mterrstafm_check.
 
 # --- 4. Mapping condition and function ---
+MAPPING_FUNCTION = {
+    "FNFM Uplink telemetry check": status_check,
+    "FNFM LIN device check": status_check,
+    "FNFM CAN device check": status_check,
+    "FNFM Motor Error Status": mterrstafm_check,
+    "FNFM Solenoid PHM HALL Voltage": limit_check,
+    "FNFM Solenoid PHM Digital Voltage": limit_check,
+    "FNFM Solenoid PHM LIN Voltage ADC": limit_check,
+    "FNFM Master Controller Reference Voltage": limit_check,
+    "FNFM Master Controller Digital Voltage": limit_check,
+    "FNFM Master Controller Input Voltage": limit_check,
+    "FNFM Master Controller Core Voltage": limit_check,
+    "FNFM Master Controller EIP Core Voltage": limit_check,
+    "FNFM Master Controller EIP Digital Voltage": limit_check,
+    "FNFM LVPS Digital Voltage": limit_check,
+    "FNFM LVPS Positive Analog Voltage": limit_check,
+    "FNFM LVPS Negative Analog Voltage": limit_check,
+    "FNFM Small pump calibration check": small_pump,
+    "FNFM Large pump calibration check": large_pump
+}
+
 def execute_function_from_the_map(message, mapping, conn, partition_id, datachannel):
     """
     Execution of the function
@@ -225,24 +191,258 @@ def recursive_execute_function(dict_tuple_result, mapping, conn, partition_id):
     """
     result_list = []
     all_tuples = [t for tuples in dict_tuple_result.values() for t in tuples]
-    df_tuples = pd.DataFrame(all_tuples, columns=['Subject', 'Predicate', 'Object'])
+    # Arrow table so duckdb scans the triples without going through object-dtype pandas
+    tuples_table = pa.table({
+        name: pa.array([t[i] for t in all_tuples], type=pa.string())
+        for i, name in enumerate(['Subject', 'Predicate', 'Object'])
+    })
     query_trigger_datachannel = """
     SELECT DISTINCT t1.Object AS Trigger,t2.Predicate AS Consume, t2.Object AS DataChannel
-    FROM df_tuples t1
-    JOIN df_tuples t2 ON t1.Object = t2.Subject
+    FROM tuples_table t1
+    JOIN tuples_table t2 ON t1.Object = t2.Subject
     WHERE t1.Predicate = 'isTriggeredBy' AND t2.Predicate = 'consume'
     """
-    result_df = duckdb.query(query_trigger_datachannel).to_df()
-    for index, row in result_df.iterrows():
-        function = row.iloc[0]
-        consume = row.iloc[1]
-        datachannel = row.iloc[2]
-        result = execute_function_from_the_map(function, mapping, conn, partition_id, datachannel)
-        result_list.append((function, consume, datachannel, result))
+    with span('duckdb'):
+        result_rows = duckdb.query(query_trigger_datachannel).fetch_arrow_table().to_pylist()
+    # Each (check function, data channel) pair is evaluated once, however many
+    # triggers or failures share it
+    check_results = {}
+    for row in result_rows:
+        function = row['Trigger']
+        consume = row['Consume']
+        datachannel = row['DataChannel']
+        check = mapping.get(function)
+        check_key = (check, datachannel)
+        if check_key not in check_results:
+            if check is None:
+                check_results[check_key] = execute_function_from_the_map(function, mapping, conn, partition_id, datachannel)
+            else:
+                # Results prefetched when the job was selected (or by a recent analysis) are reused,
+                # and a prefetch of the same pair still running in this process is joined
+                check_results[check_key] = evaluate_check(conn, partition_id, check, datachannel)
+        result_list.append((function, consume, datachannel, check_results[check_key]))
     df = pd.DataFrame(result_list, columns=['Subject', 'Predicate', 'Object', 'Status'])
     return df
 
+@functools.lru_cache(maxsize=1)
+def kg_check_pairs():
+    """
+    Return every distinct (check function, data channel) pair mapped in the KG, for prefetching.
+    """
+    query = """
+    PREFIX troubleshooting_ora_fnfm_ontology_: <http://www.slb.com/ontologies/Troubleshooting_ORA_FNFM_Ontology_#>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    SELECT DISTINCT ?trigger ?datachannel
+    WHERE {
+        ?trigger_uri troubleshooting_ora_fnfm_ontology_:consume ?datachannel_uri;
+                rdfs:label ?trigger.
+        ?datachannel_uri rdfs:label ?datachannel.
+    }
+    """
+    with span('rdflib'):
+        rows = [(str(row[0]), str(row[1])) for row in g.query(query)]
+    pairs = []
+    for trigger, datachannel in rows:
+        check = MAPPING_FUNCTION.get(trigger)
+        if check is not None:
+            pairs.append((check, datachannel))
+    return tuple(dict.fromkeys(pairs))
+
+# --- 5. Root cause analysis ---
+def root_cause_rows(df_clean, failure, messages):
+    """
+    Return the [failure, root cause, trigger, data channel] rows flagged in df_clean for one failure.
+    """
+    rows = []
+    # Names come from the KG and may contain quotes ("can't set the packer"): bind them
+    query_rootcause = """
+        SELECT Object
+        FROM df_clean
+        WHERE Subject = ? AND Predicate = 'hasRootCause'
+    """
+    try:
+        rootcause_df = duckdb.execute(query_rootcause, [failure]).df()
+        if not rootcause_df.empty:
+            for root_cause in rootcause_df["Object"]:
+                query_trigger = """
+                    SELECT Object
+                    FROM df_clean
+                    WHERE Subject = ? AND Predicate = 'isTriggeredBy'
+                """
+                trigger_df = duckdb.execute(query_trigger, [root_cause]).df()
+
+                if not trigger_df.empty:
+                    for trigger_value in trigger_df["Object"]:
+                        query_datachannel = """
+                            SELECT DISTINCT Object, Status
+                            FROM df_clean
+                            WHERE Subject=? AND Predicate='consume' AND Status=True
+                        """
+                        datachannel_df = duckdb.execute(query_datachannel, [trigger_value]).df()
+
+                        if not datachannel_df.empty:
+                            for _, row in datachannel_df.iterrows():
+                                symbol = "🔴"
+                                rows.append([failure, root_cause, trigger_value, f"{row['Object']} {symbol}"])
+        else:
+            messages.append(f"No root causes found for the failure {failure}.")
+    except Exception as e:
+        messages.append(f"Error during root cause analysis of {failure}: {e}")
+    return rows
+
+# --- 6. Graph generation ---
+def build_graph(df_clean, cluster_quiet=False):
+    """
+    Build the pyvis network of df_clean with precomputed node positions (physics off,
+    unless the layout could not be computed).
+    With cluster_quiet, triggers whose data channels all passed are collapsed into one node.
+    """
+    net = Network(height="1100px", width="100%", directed=True, notebook=True) # notebook=True for standalone HTML
+    # A failure without triples leaves df_clean without any column
+    rows = [] if df_clean.empty else list(df_clean[['Subject', 'Predicate', 'Object', 'Status']].itertuples(index=False, name=None))
+
+    # Positions only depend on the KG structure (all edges, before any clustering);
+    # collapsed triggers keep their structural position and status colors are applied on top
+    positions = cached_layout(kg_loaded_version, [(row[0], row[2]) for row in rows])
+
+    quiet_triggers = {}
+    if cluster_quiet:
+        consumed = {}
+        for subject, predicate, object_node, status in rows:
+            if predicate == "consume":
+                consumed.setdefault(subject, []).append(status)
+        quiet_triggers = {trigger: len(statuses) for trigger, statuses in consumed.items()
+                          if all(status == False for status in statuses)}
+        rows = [row for row in rows if not (row[1] == "consume" and row[0] in quiet_triggers)]
+
+    for subject, predicate, object_node, status in rows:
+        # Define colors and titles based on predicate and status
+        color_subject = "#A7C7E7" # Default
+        color_object = "#A7C7E7" # Default
+        color_predicate = "#A7C7E7" # Default
+        title_subject = f"name:{subject}"
+        title_object = f"name:{object_node}"
+        title_predicate = f"name:{predicate}"
+
+        if predicate == "hasRootCause":
+            color_subject = "#FFCC99"
+            color_object = "#C5A3FF"
+            title_subject = f"type:failure, name:{subject}"
+            title_object = f"type:Root Cause, name:{object_node}"
+        elif predicate == "isTriggeredBy":
+            color_subject = "#C5A3FF"
+            color_object = "#D2B48C"
+            title_subject = f"type:Root Cause, name:{subject}"
+            title_object = f"type:Trigger, name:{object_node}, value:{status}"
+        elif predicate == "next":
+            color_subject = "#C5A3FF"
+            color_object = "#C5A3FF"
+            title_subject = f"type:Root Cause, name:{subject}"
+            title_object = f"type:Root Cause, name:{object_node}"
+        elif predicate == "cause":
+            color_subject = "#FFCC99"
+            color_object = "#FFCC99"
+            title_subject = f"type:Failure, name:{subject}"
+            title_object = f"type:Failure, name:{object_node}"
+        elif predicate == "consume":
+            color_subject = "#D2B48C"
+            title_subject = f"type:trigger, name:{subject}"
+            title_object = f"type:data channel, name:{object_node}"
+            if status == False:
+                color_object = "green"
+                color_predicate = "green"
+            elif status == True:
+                color_object = "red"
+                color_predicate = "red"
+
+        net.add_node(subject, color=color_subject, label=subject, title=title_subject)
+        net.add_node(object_node, color=color_object, label=object_node, title=title_object)
+        net.add_edge(subject, object_node, color=color_predicate, title=title_predicate)
+
+    for trigger, channel_count in quiet_triggers.items():
+        if trigger not in net.node_map:
+            continue
+        node = net.get_node(trigger)
+        node['label'] = f"{trigger} ({channel_count} data channels OK)"
+        node['title'] = f"type:Trigger, name:{trigger}, {channel_count} data channels without alert"
+        node['borderWidth'] = 3
+        node['color'] = {'background': node['color'], 'border': "green"}
+
+    if positions is not None:
+        for node in net.nodes:
+            if node['id'] in positions:
+                node['x'], node['y'] = positions[node['id']]
+        net.toggle_physics(False)
+    return net
+
+# --- 7. Analysis ---
+# Graph files are written per distinct analysis: the ones not rewritten for this long are removed
+GRAPH_MAX_AGE = 24 * 3600
+GRAPH_FILE_PATTERN = re.compile(r'^graph_.+_[0-9a-f]{10}\.html(\.gz|\.br)?$')
+
+def prune_graphs(directory, max_age=GRAPH_MAX_AGE):
+    """
+    Remove the graph files (and their .gz/.br variants) in directory older than max_age seconds.
+    """
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        if not GRAPH_FILE_PATTERN.match(name):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass # Removed by another worker in the meantime
+
+def run_analysis(conn, partition_id, failures, cluster_quiet=False):
+    """
+    Run the checks of failures against partition_id and render the graph.
+    Returns a picklable dict so concurrent waiters (and other workers) can share it.
+    """
+    messages = []
+    dic_tuple_result = graph_search_union(failures, max_depth=-1)
+
+    with statement_stats() as stats:
+        result_df_functions = recursive_execute_function(dic_tuple_result, MAPPING_FUNCTION, conn, partition_id)
+    # Parse/plan requests are bounded by the distinct statement texts, not the executions
+    annotate(statement_executions=stats['executions'], distinct_statements=len(stats['statements']))
+
+    all_tuples = [t for tuples in dic_tuple_result.values() for t in tuples]
+    df_tuples = pd.DataFrame(all_tuples, columns=['Subject', 'Predicate', 'Object'])
+    df_final = pd.merge(df_tuples, result_df_functions, on=["Subject", "Predicate", "Object"], how="left")
+    df_clean = df_final[df_final["Status"].apply(lambda x: x is not None)]
+
+    # --- Root Cause Analysis Table (one breakdown per failure) ---
+    root_cause_table_data = []
+    with span('duckdb'):
+        for failure in failures:
+            root_cause_table_data.extend(root_cause_rows(df_clean, failure, messages))
+
+    # --- Pyvis Graph Generation ---
+    net = build_graph(df_clean, cluster_quiet=cluster_quiet)
+
+    # Save the graph to the static/graphs directory, one file per distinct analysis
+    # so different failure selections on the same partition never overwrite each other
+    analysis_digest = hashlib.sha1(repr((sorted(set(failures)), cluster_quiet)).encode('utf-8')).hexdigest()[:10]
+    graph_filename = f"graph_{partition_id}_{analysis_digest}.html"
+    graph_output_path = os.path.join(settings.STATICFILES_DIRS[0], 'graphs', graph_filename)
+    # Served with the local, hashed vis-network assets instead of the CDN copies
+    with open(graph_output_path, 'w', encoding='utf-8') as graph_file:
+        graph_file.write(localise_graph_assets(net.generate_html(graph_output_path)))
+    write_precompressed(graph_output_path)
+    prune_graphs(os.path.dirname(graph_output_path))
+    graph_html_path = os.path.join(settings.STATIC_URL, 'graphs', graph_filename) # URL to access it
+
+    return {
+        'df_clean': df_clean,
+        'root_cause_table_data': root_cause_table_data,
+        'graph_html_path': graph_html_path,
+        'messages': messages,
+    }
+
 # --- Main Django View ---
+@profiled_view
 def troubleshooter_view(request):
     form = TroubleshooterForm()
     failure_list = []
@@ -254,6 +454,7 @@ def troubleshooter_view(request):
     df_clean = pd.DataFrame()
     root_cause_table_data = []
     graph_html_path = None
+    selected_failures = []
     messages = [] # To store messages like errors or successful operations
 
     # Ensure Teradata connection is available
@@ -263,6 +464,7 @@ def troubleshooter_view(request):
             'form': form,
             'messages': messages,
             'failure_list': failure_list,
+            'selected_failures': selected_failures,
             'partition_id': partition_id,
             'df_clean_html': None,
             'root_cause_table_html': None,
@@ -282,13 +484,21 @@ WHERE {
   rdfs:label ?failure
 }
 """
-            failure_query_result = g.query(query)
-            df_failures = pd.DataFrame(failure_query_result, columns=["failure"])
+            with span('rdflib'):
+                failure_query_result = g.query(query)
+                df_failures = pd.DataFrame(failure_query_result, columns=["failure"])
             failure_list = df_failures["failure"].tolist()
 
             # Populate initial serial number choices
-            sql_metadata = """sel * from PRD_RP_PRODUCT_VIEW.FNFM_FLEET_METADATA"""
-            df_metadata = pd.read_sql(sql_metadata, conn)
+            # Only the columns behind the dropdowns are fetched
+            sql_metadata = """sel serial_number, job_number, job_start from PRD_RP_PRODUCT_VIEW.FNFM_FLEET_METADATA"""
+            # duckdb consumes the Arrow stream directly and only the distinct combinations
+            # behind the dropdowns are materialised in pandas
+            metadata_reader = fetch_arrow(sql_metadata, conn)
+            with span('duckdb'):
+                df_metadata = duckdb.query(
+                    "SELECT DISTINCT serial_number, job_number, job_start FROM metadata_reader"
+                ).to_df()
             serial_number_choices = sorted([(str(x), str(x)) for x in df_metadata["serial_number"].fillna('NaN').unique()])
             form.fields['serial_number'].choices = [('', 'Select serial number...')] + serial_number_choices
 
@@ -301,7 +511,10 @@ WHERE {
                 selected_serial_number = request.POST.get('serial_number')
                 selected_job_number = request.POST.get('job_number')
                 selected_job_start = request.POST.get('job_start')
-                selected_failure = request.POST.get('failure_selectbox') # This will come from the template's hidden input or direct select
+                selected_failures = request.POST.getlist('failure_selectbox') # Multi-select: every failure is analysed against the same job
+                selected_cluster_quiet = request.POST.get('cluster_quiet') == 'on'
+                annotate(serial_number=selected_serial_number, job_number=selected_job_number,
+                         job_start=selected_job_start, failures=selected_failures)
 
                 # Dynamic population of job_number and job_start based on selections
                 if selected_serial_number and selected_serial_number != 'NaN':
@@ -314,147 +527,34 @@ WHERE {
                         job_start_choices = sorted([(str(x), str(x)) for x in df_serial_and_job_number["job_start"].fillna('NaN').unique()])
                         form.fields['job_start'].choices = [('', 'Select start job...')] + job_start_choices
 
+                # As soon as the job is known, resolve partition_id; while the user is still
+                # choosing failures, prefetch its checks in the background
+                if selected_serial_number and selected_job_number and selected_job_start:
+                    try:
+                        partition_id = lookup_partition_id(conn, selected_serial_number, selected_job_number, selected_job_start)
+                        annotate(partition_id=partition_id)
+                        if partition_id is not None and not selected_failures:
+                            start_prefetch(td_engine, partition_id, kg_check_pairs())
+                    except Exception as e:
+                        messages.append(f"An error occurred while resolving the partition_id: {e}")
+
                 # Process if all required fields are selected
-                if selected_serial_number and selected_job_number and selected_job_start and selected_failure:
+                if selected_serial_number and selected_job_number and selected_job_start and selected_failures:
                     try:
-                        sql_partition_id = f"""
-                        sel partition_id
-                        from PRD_RP_PRODUCT_VIEW.FNFM_FLEET_METADATA
-                        where
-                        serial_number = '{selected_serial_number}' and
-                        job_number = '{selected_job_number}' and
-                        CAST(job_start AS CHAR(26)) = '{selected_job_start}';"""
-
-                        df_partition_id = pd.read_sql(sql_partition_id, conn)
-                        if not df_partition_id.empty:
-                            partition_id = df_partition_id.iloc[0, 0]
+                        if partition_id is not None:
                             messages.append(f"The partition_id associated with your chosen serial number, job number and start job is {partition_id}")
 
                             # --- Execute the core logic ---
-                            dic_tuple_result = graph_search_tuple(selected_failure, max_depth=-1)
-
-                            mapping_function = {
-                                "FNFM Uplink telemetry check": status_check,
-                                "FNFM LIN device check": status_check,
-                                "FNFM CAN device check": status_check,
-                                "FNFM Motor Error Status": mterrstafm_check,
-                                "FNFM Solenoid PHM HALL Voltage": limit_check,
-                                "FNFM Solenoid PHM Digital Voltage": limit_check,
-                                "FNFM Solenoid PHM LIN Voltage ADC": limit_check,
-                                "FNFM Master Controller Reference Voltage": limit_check,
-                                "FNFM Master Controller Digital Voltage": limit_check,
-                                "FNFM Master Controller Input Voltage": limit_check,
-                                "FNFM Master Controller Core Voltage": limit_check,
-                                "FNFM Master Controller EIP Core Voltage": limit_check,
-                                "FNFM Master Controller EIP Digital Voltage": limit_check,
-                                "FNFM LVPS Digital Voltage": limit_check,
-                                "FNFM LVPS Positive Analog Voltage": limit_check,
-                                "FNFM LVPS Negative Analog Voltage": limit_check,
-                                "FNFM Small pump calibration check": small_pump,
-                                "FNFM Large pump calibration check": large_pump
-                            }
-
-                            result_df_functions = recursive_execute_function(dic_tuple_result, mapping_function, conn, partition_id)
-
-                            all_tuples = [t for tuples in dic_tuple_result.values() for t in tuples]
-                            df_tuples = pd.DataFrame(all_tuples, columns=['Subject', 'Predicate', 'Object'])
-                            df_final = pd.merge(df_tuples, result_df_functions, on=["Subject", "Predicate", "Object"], how="left")
-                            df_clean = df_final[df_final["Status"].apply(lambda x: x is not None)]
-
-                            # --- Root Cause Analysis Table ---
-                            query_rootcause = f"""
-                                SELECT Object
-                                FROM df_clean
-                                WHERE Subject = '{selected_failure}' AND Predicate = 'hasRootCause'
-                            """
-                            try:
-                                rootcause_df = duckdb.query(query_rootcause).to_df()
-                                if not rootcause_df.empty:
-                                    for root_cause in rootcause_df["Object"]:
-                                        query_trigger = f"""
-                                            SELECT Object
-                                            FROM df_clean
-                                            WHERE Subject = '{root_cause}' AND Predicate = 'isTriggeredBy'
-                                        """
-                                        trigger_df = duckdb.query(query_trigger).to_df()
-
-                                        if not trigger_df.empty:
-                                            for trigger_value in trigger_df["Object"]:
-                                                query_datachannel = f"""
-                                                    SELECT DISTINCT Object, Status
-                                                    FROM df_clean
-                                                    WHERE Subject='{trigger_value}' AND Predicate='consume' AND Status=True
-                                                """
-                                                datachannel_df = duckdb.query(query_datachannel).to_df()
-
-                                                if not datachannel_df.empty:
-                                                    for _, row in datachannel_df.iterrows():
-                                                        symbol = "🔴"
-                                                        root_cause_table_data.append([root_cause, trigger_value, f"{row['Object']} {symbol}"])
-                                else:
-                                    messages.append("No root causes found for the selected failure.")
-                            except Exception as e:
-                                messages.append(f"Error during root cause analysis: {e}")
-
-                            # --- Pyvis Graph Generation ---
-                            net = Network(height="1100px", width="100%", directed=True, notebook=True) # notebook=True for standalone HTML
-
-                            for _, row in df_clean.iterrows():
-                                subject = row['Subject']
-                                predicate = row['Predicate']
-                                object_node = row['Object']
-                                status = row['Status']
-
-                                # Define colors and titles based on predicate and status
-                                color_subject = "#A7C7E7" # Default
-                                color_object = "#A7C7E7" # Default
-                                color_predicate = "#A7C7E7" # Default
-                                title_subject = f"name:{subject}"
-                                title_object = f"name:{object_node}"
-                                title_predicate = f"name:{predicate}"
-
-                                if predicate == "hasRootCause":
-                                    color_subject = "#FFCC99"
-                                    color_object = "#C5A3FF"
-                                    title_subject = f"type:failure, name:{subject}"
-                                    title_object = f"type:Root Cause, name:{object_node}"
-                                elif predicate == "isTriggeredBy":
-                                    color_subject = "#C5A3FF"
-                                    color_object = "#D2B48C"
-                                    title_subject = f"type:Root Cause, name:{subject}"
-                                    title_object = f"type:Trigger, name:{object_node}, value:{status}"
-                                elif predicate == "next":
-                                    color_subject = "#C5A3FF"
-                                    color_object = "#C5A3FF"
-                                    title_subject = f"type:Root Cause, name:{subject}"
-                                    title_object = f"type:Root Cause, name:{object_node}"
-                                elif predicate == "cause":
-                                    color_subject = "#FFCC99"
-                                    color_object = "#FFCC99"
-                                    title_subject = f"type:Failure, name:{subject}"
-                                    title_object = f"type:Failure, name:{object_node}"
-                                elif predicate == "consume":
-                                    color_subject = "#D2B48C"
-                                    title_subject = f"type:trigger, name:{subject}"
-                                    title_object = f"type:data channel, name:{object_node}"
-                                    if status == False:
-                                        color_object = "green"
-                                        color_predicate = "green"
-                                    elif status == True:
-                                        color_object = "red"
-                                        color_predicate = "red"
-
-                                net.add_node(subject, color=color_subject, label=subject, title=title_subject)
-                                net.add_node(object_node, color=color_object, label=object_node, title=title_object)
-                                net.add_edge(subject, object_node, color=color_predicate, title=title_predicate)
-
-                            net.force_atlas_2based(gravity=-50, central_gravity=0.01, spring_length=200, spring_strength=0.05)
-
-                            # Save the graph to the static/graphs directory
-                            graph_filename = f"graph_{partition_id}.html"
-                            graph_output_path = os.path.join(settings.STATICFILES_DIRS[0], 'graphs', graph_filename)
-                            net.save_graph(graph_output_path)
-                            graph_html_path = os.path.join(settings.STATIC_URL, 'graphs', graph_filename) # URL to access it
+                            # Identical concurrent analyses (same partition, failures and options) share one computation
+                            analysis_key = ('analysis', str(partition_id), tuple(sorted(set(selected_failures))), selected_cluster_quiet)
+                            analysis = single_flight(
+                                analysis_key,
+                                lambda: run_analysis(conn, partition_id, selected_failures, selected_cluster_quiet),
+                            )
+                            df_clean = analysis['df_clean']
+                            root_cause_table_data = analysis['root_cause_table_data']
+                            graph_html_path = analysis['graph_html_path']
+                            messages.extend(analysis['messages'])
 
                         else:
                             messages.append("Error: Could not find partition_id for the selected criteria.")
@@ -462,20 +562,21 @@ WHERE {
                     except Exception as e:
                         messages.append(f"An error occurred during data processing: {e}")
                 else:
-                    messages.append("Please select all fields (Serial Number, Job Number, Start Job, and Failure) to proceed.")
+                    messages.append("Please select all fields (Serial Number, Job Number, Start Job, and at least one Failure) to proceed.")
 
     except Exception as e:
         messages.append(f"An unexpected error occurred: {e}")
 
     # Prepare data for rendering
     df_clean_html = df_clean.to_html(classes='table table-striped table-bordered', index=False) if not df_clean.empty else None
-    root_cause_table_html = pd.DataFrame(root_cause_table_data, columns=["Root Cause", "Trigger", "Data Channel"]).to_html(classes='table table-striped table-bordered', index=False) if root_cause_table_data else None
+    root_cause_table_html = pd.DataFrame(root_cause_table_data, columns=["Failure", "Root Cause", "Trigger", "Data Channel"]).to_html(classes='table table-striped table-bordered', index=False) if root_cause_table_data else None
 
 
     context = {
         'form': form,
         'messages': messages,
         'failure_list': failure_list,
+        'selected_failures': selected_failures,
         'partition_id': partition_id,
         'df_clean_html': df_clean_html,
         'root_cause_table_html': root_cause_table_html,